@@ -5,6 +5,7 @@
 
 import customtkinter as ctk
 import pandas as pd
+import numpy as np
 import openpyxl
 import plotly.express as px
 import os
@@ -14,6 +15,7 @@ import threading
 import time
 import sys
 import re
+import html
 import traceback
 from tkinter import filedialog, messagebox
 from tkinter import ttk
@@ -44,6 +46,13 @@ def ler_arquivo(path, regras):
     except Exception as e:
         raise RuntimeError(f"Falha na leitura: {e}")
 
+def obter_mtime(path):
+    """Data de modificação do arquivo; 0 se ele não puder ser consultado (removido, bloqueado)"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
 def ler_arquivo_simples(path):
     """Função para ler arquivos simples sem regras específicas"""
     try:
@@ -121,9 +130,9 @@ class SummaryWindow(ctk.CTkToplevel):
     def __init__(self, parent, stats):
         super().__init__(parent)
         self.title("Sumário do Processamento")
-        self.geometry("600x420")
+        self.geometry("600x450")
         ctk.CTkLabel(self, text="Processo Concluído!", font=("Arial", 20, "bold"), text_color="#33FF33").pack(pady=15)
-        for text in [f"Arquivos Encontrados: {stats['total']}", f"Processados com Sucesso: {stats['success']}", f"Ignorados / Com Erro: {stats['errors']}", f"Total de Linhas Unificadas: {stats['rows']:,}".replace(",", "."), f"Tempo de Execução: {stats['time']:.2f} segundos"]:
+        for text in [f"Arquivos Encontrados: {stats['total']}", f"Processados com Sucesso: {stats['success']}", f"Ignorados / Com Erro: {stats['errors']}", f"Total de Linhas Unificadas: {stats['rows']:,}".replace(",", "."), f"Duplicatas Removidas: {stats.get('duplicates', 0):,}".replace(",", "."), f"Tempo de Execução: {stats['time']:.2f} segundos"]:
             ctk.CTkLabel(self, text=text, font=("Arial", 14)).pack(anchor="w", padx=30, pady=2)
         
         btn_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -207,12 +216,18 @@ class Processor:
         arquivos = self._descobrir_arquivos(pasta_in, regras)
         if not arquivos: return
 
-        dados_validos, erros = self._processar_arquivos_em_lote(arquivos, regras, silent)
+        dados_validos, erros, duplicatas_por_arquivo, arquivos_sem_linhas_novas = self._processar_arquivos_em_lote(arquivos, regras, silent)
         if not dados_validos: 
             self._gerar_relatorio_erros(erros, processo_nome)
             if not silent: self.app.after(100, lambda: self.app.btn_iniciar.configure(state="normal", text="INICIAR PROCESSAMENTO"))
             return
 
+        total_duplicatas = sum(duplicatas_por_arquivo.values())
+        if total_duplicatas:
+            self.app.log(f"Deduplicação: {total_duplicatas} linha(s) duplicada(s) removida(s).", "INFO")
+            for nome_arquivo, removidas in duplicatas_por_arquivo.items():
+                if removidas: self.app.log(f"  {nome_arquivo}: {removidas} linha(s) removida(s)", "INFO")
+
         planilha_final_renamed = self._unificar_e_tratar_dados(dados_validos, regras)
         
         try:
@@ -224,9 +239,10 @@ class Processor:
         
         dashboard_path = self._gerar_dashboard_html(planilha_final_renamed, pasta_out, regras)
             
-        stats = {"total": len(arquivos), "success": len(dados_validos), "errors": len(erros), 
+        stats = {"total": len(arquivos), "success": len(dados_validos) + arquivos_sem_linhas_novas, "errors": len(erros), 
                  "rows": len(planilha_final_renamed), "time": time.time() - start_time, 
-                 "output_path": pasta_out, "dashboard_path": dashboard_path}
+                 "output_path": pasta_out, "dashboard_path": dashboard_path,
+                 "duplicates": total_duplicatas}
         
         self._finalizar_execucao(stats, erros, processo_nome, silent)
 
@@ -245,9 +261,44 @@ class Processor:
         if not arquivos: self.app.log("Nenhum arquivo compatível encontrado.", "WARNING"); return []
         return arquivos
 
+    def _normalizar_chave(self, serie, tipo_esperado):
+        # Colunas inteiras com células vazias chegam como float64 (12345.0): volta para o texto inteiro
+        texto = serie.astype(str)
+        if pd.api.types.is_float_dtype(serie):
+            inteiros = serie.notna() & (serie % 1 == 0)
+            texto[inteiros] = serie[inteiros].astype('int64').astype(str)
+        texto = texto.where(serie.notna()).str.strip().str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+        if tipo_esperado == 'cpf':
+            # "123.456.789-01", "12345678901" e CPFs lidos como número (sem zeros à esquerda) coincidem
+            texto = texto.str.replace(r'\D', '', regex=True)
+            texto = texto.where(texto != '').str.zfill(11)
+        return texto.where(texto != '')
+
+    def _deduplicar_arquivo(self, df, chaves_clean, tipos_chaves, indice_hashes):
+        """Remove as linhas cujas chaves já estão no índice (array uint64 ordenado) e devolve o índice atualizado"""
+        chaves_df = pd.DataFrame({c: self._normalizar_chave(df[c], tipos_chaves.get(c)) for c in chaves_clean})
+        # Chave parcial não identifica a proposta (ex.: mesmo CPF sem número de proposta), então não deduplica
+        sem_chave = chaves_df.isna().any(axis=1)
+        hashes = pd.util.hash_pandas_object(chaves_df, index=False).to_numpy()
+        posicoes = np.searchsorted(indice_hashes, hashes)
+        ja_indexada = np.zeros(len(hashes), dtype=bool)
+        if len(indice_hashes):
+            ja_indexada = indice_hashes[np.minimum(posicoes, len(indice_hashes) - 1)] == hashes
+        duplicada = (pd.Series(hashes).duplicated().to_numpy() | ja_indexada) & ~sem_chave.to_numpy()
+        # Insere os novos hashes mantendo o array ordenado (custo de cópia linear, sem reordenar o índice todo)
+        novos = np.sort(hashes[~duplicada & ~sem_chave.to_numpy()])
+        indice_hashes = np.insert(indice_hashes, np.searchsorted(indice_hashes, novos), novos)
+        return df[~duplicada].copy(), int(duplicada.sum()), indice_hashes
+
     def _processar_arquivos_em_lote(self, arquivos, regras, silent):
         dados_validos, erros, total = [], [], len(arquivos)
         regras_essenciais_clean = [clean_name(c) for c in regras.get("colunas_essenciais", [])]
+        chaves_dedup_clean = [clean_name(c) for c in regras.get("chaves_deduplicacao", [])]
+        tipos_chaves = {clean_name(k): v.get("tipo_esperado") for k, v in regras.get("colunas_padrao", {}).items()}
+        indice_hashes, duplicatas_por_arquivo, arquivos_sem_linhas_novas = np.empty(0, dtype=np.uint64), {}, 0
+        if chaves_dedup_clean:
+            # Mais recentes primeiro: a primeira ocorrência indexada é a versão mais nova da proposta
+            arquivos = sorted(arquivos, key=obter_mtime, reverse=True)
         for i, path in enumerate(arquivos):
             nome_arquivo = os.path.basename(path)
             self.app.log(f"Processando {i+1}/{total}: {nome_arquivo}", "INFO")
@@ -261,11 +312,23 @@ class Processor:
                     colunas_faltantes = [c for c in regras_essenciais_clean if c not in df.columns]
                     erros.append(f"{nome_arquivo}: Ignorado - Colunas essenciais ausentes: {colunas_faltantes}")
                     continue
+                if chaves_dedup_clean:
+                    chaves_faltantes = [c for c in chaves_dedup_clean if c not in df.columns]
+                    if chaves_faltantes:
+                        self.app.log(f"{nome_arquivo}: chaves de deduplicação ausentes {chaves_faltantes}, arquivo mantido sem deduplicar.", "WARNING")
+                    else:
+                        df, removidas, indice_hashes = self._deduplicar_arquivo(df, chaves_dedup_clean, tipos_chaves, indice_hashes)
+                        # Arquivos homônimos em subpastas somam suas contagens sob o mesmo arquivo_origem
+                        duplicatas_por_arquivo[nome_arquivo] = duplicatas_por_arquivo.get(nome_arquivo, 0) + removidas
+                        if df.empty:
+                            self.app.log(f"{nome_arquivo}: todas as linhas já constavam em arquivos mais recentes.", "INFO")
+                            arquivos_sem_linhas_novas += 1
+                            continue
                 df['arquivo_origem'] = nome_arquivo
                 dados_validos.append(df)
             except Exception as e:
                 erros.append(f"{nome_arquivo}: Erro - {e}")
-        return dados_validos, erros
+        return dados_validos, erros, duplicatas_por_arquivo, arquivos_sem_linhas_novas
     
     def _gerar_relatorio_excel(self, df, pasta_out, regras):
         with pd.ExcelWriter(pasta_out, engine='openpyxl') as writer:
@@ -275,9 +338,86 @@ class Processor:
         self.app.log("Ajustando colunas no Excel...", "INFO")
         auto_adjust_excel_columns(pasta_out)
 
+    def _agregar_para_dashboard(self, df, dimensao, coluna_valor, funcao_agg, limite=None):
+        if dimensao not in df.columns: return None
+        agrupado = df.groupby(dimensao, dropna=True, observed=True)[coluna_valor].agg(funcao_agg)
+        agrupado = agrupado.sort_values(ascending=False)
+        # Mantém apenas as maiores categorias e consolida o restante em "Outros",
+        # reagregando as linhas originais para que média/máximo/mínimo continuem corretos
+        if limite and len(agrupado) > limite:
+            principais = agrupado.index[:limite]
+            categorias = df[dimensao].astype(object)
+            categorias = categorias.where(categorias.isin(principais) | categorias.isna(), 'Outros')
+            outros = df.loc[categorias == 'Outros', coluna_valor].agg(funcao_agg)
+            agrupado = pd.concat([agrupado.loc[principais[principais != 'Outros']], pd.Series({'Outros': outros})])
+        return agrupado.rename_axis(dimensao).reset_index(name=coluna_valor)
+
     def _gerar_dashboard_html(self, df, pasta_out, regras):
-        # Desabilitado para simplificar e focar no problema principal
-        return None
+        self.app.log("Gerando dashboard HTML...", "INFO")
+        try:
+            # Reaproveita as definições da tabela dinâmica do config.json, quando existirem
+            tabela = regras.get("tabela_dinamica", {}) or {}
+            if tabela.get("criar") is False:
+                self.app.log("Dashboard não gerado: 'tabela_dinamica' desativada para este processo.", "INFO")
+                return None
+            # Os padrões só valem para processos que de fato declaram essas colunas
+            colunas_padrao = regras.get("colunas_padrao", {})
+            valores = tabela.get("valores") or ["Vlr. emprestimo" if "Vlr. emprestimo" in colunas_padrao else None]
+            linhas = tabela.get("linhas") or ["Nome do Agente" if "Nome do Agente" in colunas_padrao else None]
+            colunas = tabela.get("colunas") or ["Estado" if "Estado" in colunas_padrao else None]
+            mapa_agg = {"sum": "sum", "average": "mean", "mean": "mean", "count": "count", "max": "max", "min": "min"}
+            funcao_agg = mapa_agg.get(str(tabela.get("agregacao", "Sum")).lower(), "sum")
+
+            coluna_valor = valores[0]
+            if coluna_valor in df.columns:
+                serie_valor = pd.to_numeric(df[coluna_valor], errors='coerce')
+            else:
+                # Sem coluna de valor: o dashboard passa a contar propostas
+                coluna_valor, funcao_agg = "Quantidade", "count"
+                serie_valor = pd.Series(1, index=df.index)
+
+            # Frame enxuto com apenas as colunas usadas nos agrupamentos
+            dimensoes = [linhas[0], colunas[0], 'arquivo_origem']
+            base = pd.DataFrame({d: df[d].astype('category') for d in dimensoes if d in df.columns})
+            base[coluna_valor] = serie_valor
+
+            graficos = []
+            for dimensao, titulo, limite in [(linhas[0], f"{coluna_valor} por {linhas[0]}", 30),
+                                             (colunas[0], f"{coluna_valor} por {colunas[0]}", 30),
+                                             ('arquivo_origem', f"{coluna_valor} por Arquivo de Origem", 50)]:
+                resumo = self._agregar_para_dashboard(base, dimensao, coluna_valor, funcao_agg, limite)
+                if resumo is not None and not resumo.empty:
+                    graficos.append(px.bar(resumo, x=dimensao, y=coluna_valor, title=titulo))
+
+            if 'Data Cadastro' in df.columns:
+                datas = pd.to_datetime(df['Data Cadastro'], errors='coerce', dayfirst=True)
+                validas = datas.notna()
+                if validas.any():
+                    # Granularidade diária para períodos curtos e mensal para séries longas
+                    intervalo_dias = (datas[validas].max() - datas[validas].min()).days
+                    periodo = 'D' if intervalo_dias <= 120 else 'M'
+                    chave = datas[validas].dt.to_period(periodo).dt.to_timestamp()
+                    serie = base.loc[validas, coluna_valor].groupby(chave).agg(funcao_agg)
+                    resumo_tempo = serie.rename_axis('Data Cadastro').reset_index(name=coluna_valor)
+                    graficos.append(px.line(resumo_tempo, x='Data Cadastro', y=coluna_valor, markers=True,
+                                            title=f"{coluna_valor} ao longo do tempo (Data Cadastro)"))
+
+            if not graficos:
+                self.app.log("Dashboard não gerado: nenhuma coluna de agrupamento encontrada.", "WARNING")
+                return None
+
+            dashboard_path = os.path.splitext(pasta_out)[0] + "_Dashboard.html"
+            with open(dashboard_path, 'w', encoding='utf-8') as f:
+                f.write(f"<html><head><meta charset='utf-8'><title>Dashboard - {html.escape(os.path.basename(pasta_out))}</title></head><body>\n")
+                # A biblioteca plotly.js é embutida uma única vez, para que o dashboard abra sem acesso à internet
+                for i, fig in enumerate(graficos):
+                    f.write(fig.to_html(full_html=False, include_plotlyjs=(i == 0)))
+                f.write("</body></html>")
+            self.app.log(f"Dashboard salvo em: {dashboard_path}", "SUCCESS")
+            return dashboard_path
+        except Exception as e:
+            self.app.log(f"Não foi possível gerar o dashboard: {e}", "WARNING")
+            return None
 
     def _gerar_relatorio_erros(self, erros, processo_nome):
         if erros: